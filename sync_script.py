@@ -11,12 +11,27 @@
 #
 
 import os
+import io
 import requests
 import sys
 import re
 import json
+import threading
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import date
+from hashlib import blake2b
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # --- CONFIGURATION ---
 REPO_OWNER = ""
@@ -25,37 +40,266 @@ TRELLO_API_KEY = ""
 TRELLO_API_TOKEN = ""
 GITHUB_TOKEN = ""
 
+REQUIRED_ENV_VARS = ("GITHUB_REPO_OWNER", "GITHUB_REPO_NAME", "TRELLO_API_KEY", "TRELLO_API_TOKEN", "GITHUB_TOKEN")
+
 STATE_FILE = "sync_state.json"
 CONFIG_FILE = "config.json"
 
+# Interns are synced concurrently; kept small to stay clear of GitHub's secondary rate limits
+MAX_WORKERS = 8
+# Independent Trello writes (task state updates, deletions) share one pool across all interns
+WRITE_WORKERS = 4
+# Parsed markdown results kept per intern, keyed by the file's ETag
+PARSED_CACHE_SIZE = 4
+
 # --- API Endpoints ---
 GITHUB_API_BASE_URL = "https://api.github.com"
 TRELLO_API_BASE_URL = "https://api.trello.com/1"
 
+# --- Rate Limits ---
+# (requests per second, burst) per API host, shared by all threads
+RATE_LIMITS = {
+    "api.github.com": (80 / 60, 10),   # ~80/min keeps well inside 5000/hr and the secondary limits
+    "api.trello.com": (100 / 10, 10),  # Trello allows 100 requests per 10 seconds per token
+}
+# How often a request answered with 429 Too Many Requests is retried
+RATE_LIMIT_RETRIES = 3
+
+# --- Markdown Patterns ---
+MILESTONE_RE = re.compile(r"###\s*(.+)")
+TASK_RE = re.compile(r"-\s*\[(x| )\]\s*(.+)")
+DATE_RE = re.compile(r"###\s*(\d{4}-\d{2}-\d{2})")
+# Lines starting with these (or with any whitespace) may need stripping before they are matched
+LINE_PREFIXES = ("#", "-")
+
+# --- HTTP Session & Threading ---
+_thread_local = threading.local()
+_write_executor = ThreadPoolExecutor(max_workers=WRITE_WORKERS)
+
+class RateLimiter:
+    """Thread-safe token bucket for one API host, which can also be paused when the server asks us to slow down."""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def observe(self, response):
+        """Slows down when the response says the quota is used up (GitHub and Trello headers)."""
+        headers = response.headers
+        if headers.get("X-RateLimit-Remaining") == "0":
+            reset = headers.get("X-RateLimit-Reset")
+            if reset and reset.isdigit():
+                print("!! GitHub rate limit exhausted, pausing requests until it resets.")
+                self.pause(max(0, int(reset) - time.time()) + 1)
+        if headers.get("x-rate-limit-api-token-remaining") == "0":
+            interval_ms = headers.get("x-rate-limit-api-token-interval-ms", "10000")
+            self.pause(int(interval_ms) / 1000 if interval_ms.isdigit() else 10)
+
+_rate_limiters = {host: RateLimiter(rate, burst) for host, (rate, burst) in RATE_LIMITS.items()}
+
+class RateLimitedSession(requests.Session):
+    """requests.Session that waits for the host's RateLimiter before every request and backs off on 429s."""
+    def request(self, method, url, *args, **kwargs):
+        limiter = _rate_limiters.get(urlsplit(url).hostname)
+        if limiter is None:
+            return super().request(method, url, *args, **kwargs)
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            limiter.acquire()
+            response = super().request(method, url, *args, **kwargs)
+            if response.status_code != 429 or attempt == RATE_LIMIT_RETRIES:
+                break
+            # A 429 means the request was not processed, so retrying is safe even for POSTs
+            retry_after = response.headers.get("Retry-After", "")
+            delay = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+            print(f"-> Rate limited by {urlsplit(url).hostname}, retrying in {delay}s...")
+            limiter.pause(delay + random.uniform(0, 1))
+        limiter.observe(response)
+        return response
+
+def get_session():
+    """Returns a rate-limited requests.Session for the current thread so TCP/TLS connections are reused."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = RateLimitedSession()
+        # 429s are handled by RateLimitedSession so the pause is shared by all threads
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+        session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry))
+        _thread_local.session = session
+    return session
+
+class ThreadBufferedStdout:
+    """Sends print() output from a worker thread to its own buffer, so each intern's log stays in one block."""
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = getattr(_thread_local, "log_buffer", None)
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def send_write(method, url, params):
+    response = get_session().request(method, url, params=params)
+    response.raise_for_status()
+    return response
+
+def dispatch_writes(writes):
+    """Sends (description, method, url, params) writes on the shared write pool. Returns (description, error) for failures."""
+    futures = [(description, _write_executor.submit(send_write, method, url, params)) for description, method, url, params in writes]
+    failures = []
+    for description, future in futures:
+        try:
+            future.result()
+        except requests.exceptions.RequestException as e:
+            failures.append((description, e))
+    return failures
+
+# --- JSON Helpers ---
+def json_loads(data):
+    """Parses JSON from bytes or str, using orjson when it is installed."""
+    if orjson is not None: return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj):
+    """Serializes obj to indented UTF-8 JSON bytes, using orjson when it is installed."""
+    # Keys are not sorted: the parsed cache relies on insertion order for LRU eviction
+    if orjson is not None: return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def parsed_data_hash(parsed_data):
+    """Returns a stable digest of parse_markdown's output, used to detect logs that haven't changed."""
+    if orjson is not None:
+        encoded = orjson.dumps(parsed_data, option=orjson.OPT_SORT_KEYS)
+    else:
+        encoded = json.dumps(parsed_data, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    return blake2b(encoded, digest_size=16).hexdigest()
+
 # --- State Management ---
 def load_state():
     if not os.path.exists(STATE_FILE): return {}
     try:
-        with open(STATE_FILE, 'r') as f: return json.load(f)
-    except (json.JSONDecodeError, IOError): return {}
+        with open(STATE_FILE, 'rb') as f: return json_loads(f.read())
+    except (ValueError, IOError): return {}
 
 def save_state(state):
+    """Writes the state to a temporary file and swaps it in, so a crash mid-write never corrupts it."""
+    tmp_file = STATE_FILE + ".tmp"
     try:
-        with open(STATE_FILE, 'w') as f: json.dump(state, f, indent=4)
-    except IOError as e: print(f"Error: Could not save state file: {e}")
+        with open(tmp_file, 'wb') as f:
+            f.write(json_dumps(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, STATE_FILE)
+    except IOError as e:
+        print(f"Error: Could not save state file: {e}")
+        try: os.remove(tmp_file)
+        except OSError: pass
+
+# --- HTTP Caching ---
+def response_text(response):
+    """Decodes a response body as UTF-8, skipping requests' charset detection."""
+    response.encoding = 'utf-8'
+    return response.text
+
+def conditional_get(url, http_cache, parse, headers=None, params=None, cache_key=None):
+    """GETs a URL, revalidating the cached copy with its ETag/Last-Modified headers.
+
+    The copy is cached under cache_key, which defaults to the URL.
+    Returns (body, not_modified). Raises requests.exceptions.RequestException on failure.
+    """
+    cache_key = cache_key or url
+    headers = dict(headers or {})
+    cached = http_cache.get(cache_key)
+    if cached:
+        if cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = get_session().get(url, headers=headers, params=params)
+    if response.status_code == 304 and cached:
+        return cached["body"], True
+    response.raise_for_status()
+
+    body = parse(response)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        http_cache[cache_key] = {"etag": etag, "last_modified": last_modified, "body": body}
+    else:
+        http_cache.pop(cache_key, None)
+    return body, False
 
 # --- GitHub & Parsing Functions ---
-def get_github_file_content(branch_name, file_path):
+def github_file_url(branch_name, file_path):
+    return f"{GITHUB_API_BASE_URL}/repos/{REPO_OWNER}/{REPO_NAME}/contents/{file_path}?ref={branch_name}"
+
+def get_github_file_content(branch_name, file_path, http_cache):
+    """Fetches the raw markdown file. Returns (content, not_modified); content is None on error."""
     print(f"Fetching '{file_path}' from branch '{branch_name}'...")
-    url = f"{GITHUB_API_BASE_URL}/repos/{REPO_OWNER}/{REPO_NAME}/contents/{file_path}?ref={branch_name}"
+    url = github_file_url(branch_name, file_path)
     headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.v3.raw"}
     try:
-        response = requests.get(url, headers=headers)
+        content, not_modified = conditional_get(url, http_cache, response_text, headers=headers)
+        if not_modified:
+            print("-> File unchanged on GitHub (304), using cached copy.")
+        else:
+            print("-> Successfully fetched file from GitHub.")
+        return content, not_modified
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error fetching file from GitHub: {e}")
+        return None, False
+
+def get_github_tree(branch_name, file_paths, http_cache):
+    """Lists the branch's tree once and returns {path: blob_sha} for the requested paths, or None on error."""
+    url = f"{GITHUB_API_BASE_URL}/repos/{REPO_OWNER}/{REPO_NAME}/git/trees/{branch_name}?recursive=1"
+    headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github+json"}
+
+    def parse(response):
+        # Only the configured log files are kept so the cached tree stays small
+        return {entry['path']: entry['sha'] for entry in json_loads(response.content).get('tree', [])
+                if entry.get('type') == 'blob' and entry['path'] in file_paths}
+
+    # The cached body depends on which paths were kept, so they are part of the cache key
+    cache_key = f"{url}#{','.join(sorted(file_paths))}"
+    try:
+        tree, _ = conditional_get(url, http_cache, parse, headers=headers, cache_key=cache_key)
+        return tree
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"Error listing tree of branch '{branch_name}': {e}")
+        return None
+
+def get_github_blob_content(blob_sha):
+    """Fetches a file's content by blob SHA. Returns None on error."""
+    print(f"Fetching blob {blob_sha[:7]}...")
+    url = f"{GITHUB_API_BASE_URL}/repos/{REPO_OWNER}/{REPO_NAME}/git/blobs/{blob_sha}"
+    headers = {"Authorization": f"token {GITHUB_TOKEN}", "Accept": "application/vnd.github.raw"}
+    try:
+        response = get_session().get(url, headers=headers)
         response.raise_for_status()
         print("-> Successfully fetched file from GitHub.")
-        return response.text
+        return response_text(response)
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching file from GitHub: {e}")
+        print(f"Error fetching blob from GitHub: {e}")
         return None
 
 def parse_markdown(content):
@@ -63,21 +307,48 @@ def parse_markdown(content):
     data = {"milestones": {}, "daily_logs": {}}
     current_section = None
     current_milestone = None
+    current_date = None
+    buf = []
+
+    daily_logs = data["daily_logs"]
+    _milestone_match = MILESTONE_RE.match
+    _date_match = DATE_RE.match
+    _task_match = TASK_RE.match
+
+    def flush():
+        # Store the lines collected for the current date as one log entry
+        if current_date is not None:
+            daily_logs[current_date] = f"### {current_date}\n" + "\n".join(buf).strip()
+        buf.clear()
+
+    for line in content.splitlines():
+        # Headers, tasks and separators start with '#', '-' or whitespace (including Unicode
+        # whitespace such as NBSP, which strip() removes); any other line is plain text that
+        # only matters inside a daily log, so skip stripping it
+        first_char = line[:1]
+        if first_char not in LINE_PREFIXES and not first_char.isspace():
+            if current_section == "daily_logs" and current_date is not None:
+                buf.append(line)
+            continue
 
-    for line in content.split('\n'):
         stripped_line = line.strip()
 
         # Determine which major section we are in
         if stripped_line == "## 🏁 Milestones":
+            flush()
+            current_date = None
             current_section = "milestones"
             continue
         elif stripped_line == "## 📆 Daily Logs":
+            flush()
+            current_date = None
             current_section = "daily_logs"
             continue
         
         if current_section == "milestones":
-            milestone_match = re.match(r"###\s*(.+)", stripped_line)
-            task_match = re.match(r"-\s*\[(x| )\]\s*(.+)", stripped_line)
+            prefix = stripped_line[:1]
+            milestone_match = _milestone_match(stripped_line) if prefix == "#" else None
+            task_match = _task_match(stripped_line) if prefix == "-" else None
             if milestone_match:
                 current_milestone = milestone_match.group(1).strip()
                 data["milestones"][current_milestone] = []
@@ -87,118 +358,183 @@ def parse_markdown(content):
                 data["milestones"][current_milestone].append({"name": task_name, "checked": is_checked})
 
         elif current_section == "daily_logs":
-            date_match = re.match(r"###\s*(\d{4}-\d{2}-\d{2})", stripped_line)
+            date_match = _date_match(stripped_line) if stripped_line[:1] == "#" else None
             if date_match:
-                date_str = date_match.group(1)
-                full_log_block = content.split(stripped_line)[1].split('---')[0].strip()
-                data["daily_logs"][date_str] = f"### {date_str}\n{full_log_block}"
-
+                flush()
+                current_date = date_match.group(1)
+            elif stripped_line.startswith('---'):
+                flush()
+                current_date = None
+            elif current_date is not None:
+                buf.append(line)
+
+    flush()
     return data
 
+def get_parsed_data(cache_key, parsed_cache, load_content):
+    """Returns the parsed log file, reusing the result cached under cache_key (blob SHA or ETag) if present.
+
+    load_content is only called on a cache miss; returns None if it fails.
+    """
+    if cache_key is not None and cache_key in parsed_cache:
+        print("-> Using cached parse of the log file.")
+        parsed_data = parsed_cache.pop(cache_key)
+    else:
+        content = load_content()
+        if content is None: return None
+        parsed_data = parse_markdown(content)
+        if cache_key is None: return parsed_data
+
+    # Re-inserting keeps the dict in least- to most-recently-used order
+    parsed_cache[cache_key] = parsed_data
+    while len(parsed_cache) > PARSED_CACHE_SIZE:
+        del parsed_cache[next(iter(parsed_cache))]
+    return parsed_data
+
 # --- Trello Functions ---
 def get_trello_card_data(card_id):
     """Gets all data for a card, including checklists and comments."""
     print(f"Fetching all data for Trello card {card_id[:5]}...")
     url = f"{TRELLO_API_BASE_URL}/cards/{card_id}"
-    params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'checklists': 'all', 'actions': 'commentCard'}
+    # Only request the fields the sync reads; ids are always included by Trello
+    params = {
+        'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN,
+        'fields': 'id',
+        'checklists': 'all', 'checklist_fields': 'name', 'checkItem_fields': 'name,state',
+        'actions': 'commentCard', 'action_fields': 'data,id',
+    }
+
     try:
-        response = requests.get(url, params=params)
+        response = get_session().get(url, params=params)
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        print(f"-> Received {len(response.content)} bytes of card data.")
+        return json_loads(response.content)
+    except (requests.exceptions.RequestException, ValueError) as e:
         print(f"Error fetching Trello card data: {e}")
         return None
 
+@dataclass
+class Plan:
+    """The check item writes needed to bring one Trello checklist in line with a milestone."""
+    creates: list = field(default_factory=list)  # tasks from GitHub, in markdown order
+    updates: list = field(default_factory=list)  # (existing item, new state) pairs
+    deletes: list = field(default_factory=list)  # existing items no longer in GitHub
+
+def plan_checklist_sync(existing_items, github_tasks):
+    """Diffs a checklist's items (keyed by name) against the milestone's tasks, without calling the API."""
+    plan = Plan()
+    for task in github_tasks:
+        state_str = 'complete' if task['checked'] else 'incomplete'
+        item = existing_items.get(task['name'])
+        if item is None:
+            plan.creates.append(task)
+        elif item['state'] != state_str:
+            plan.updates.append((item, state_str))
+
+    to_delete = existing_items.keys() - {t['name'] for t in github_tasks}
+    plan.deletes = [existing_items[name] for name in sorted(to_delete)]
+    return plan
+
 def sync_milestones(card_id, card_data, milestones_from_github, state):
-    """Syncs milestones from GitHub to Trello checklists, including deletions."""
+    """Syncs milestones from GitHub to Trello checklists, including deletions. Returns False if any request failed."""
     print("--- Syncing Milestones to Checklists ---")
+    ok = True
     card_state = state.setdefault(card_id, {"checklists": {}})
     existing_checklists = {cl['name']: cl for cl in card_data.get('checklists', [])}
-    
-    # Create a set of task names from GitHub for efficient lookup
-    github_task_names_by_milestone = {m_name: {t['name'] for t in tasks} for m_name, tasks in milestones_from_github.items()}
 
     for milestone_name, tasks_from_github in milestones_from_github.items():
         checklist = None
         if milestone_name in existing_checklists:
             checklist = existing_checklists[milestone_name]
+            plan = plan_checklist_sync(
+                {item['name']: item for item in checklist.get('checkItems', [])}, tasks_from_github)
+            # Nothing to write for this milestone
+            if not (plan.creates or plan.updates or plan.deletes):
+                continue
             print(f"Found existing checklist: '{milestone_name}'")
         else:
             print(f"Creating new checklist: '{milestone_name}'")
             url = f"{TRELLO_API_BASE_URL}/checklists"
             params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'idCard': card_id, 'name': milestone_name}
             try:
-                response = requests.post(url, params=params)
+                response = get_session().post(url, params=params)
                 response.raise_for_status()
-                checklist = response.json()
+                checklist = json_loads(response.content)
                 existing_checklists[milestone_name] = checklist
-            except requests.exceptions.RequestException as e:
+                plan = plan_checklist_sync({}, tasks_from_github)
+            except (requests.exceptions.RequestException, ValueError) as e:
                 print(f"!! ERROR creating checklist '{milestone_name}': {e}")
+                ok = False
                 continue
         
         if not checklist: continue
 
-        existing_items = {item['name']: item for item in checklist.get('checkItems', [])}
-        
-        # Create/Update loop
-        for task in tasks_from_github:
+        # Creates stay sequential so new tasks keep the markdown order on the checklist
+        for task in plan.creates:
             task_name = task['name']
-            task_checked = task['checked']
-            state_str = 'complete' if task_checked else 'incomplete'
-
+            print(f" -> Creating new task: '{task_name}'")
+            url = f"{TRELLO_API_BASE_URL}/checklists/{checklist['id']}/checkItems"
+            checked_str = str(task['checked']).lower()
+            params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'name': task_name, 'checked': checked_str}
+            response = None
             try:
-                if task_name not in existing_items:
-                    print(f" -> Creating new task: '{task_name}'")
-                    url = f"{TRELLO_API_BASE_URL}/checklists/{checklist['id']}/checkItems"
-                    checked_str = str(task_checked).lower()
-                    params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'name': task_name, 'checked': checked_str}
-                    response = requests.post(url, params=params)
-                    response.raise_for_status()
-                else:
-                    item = existing_items[task_name]
-                    if item['state'] != state_str:
-                        print(f" -> Updating task state for: '{task_name}' to {state_str}")
-                        url = f"{TRELLO_API_BASE_URL}/cards/{card_id}/checkItem/{item['id']}"
-                        params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'state': state_str}
-                        response = requests.put(url, params=params)
-                        response.raise_for_status()
+                response = get_session().post(url, params=params)
+                response.raise_for_status()
             except requests.exceptions.RequestException as e:
                 print(f"!! ERROR syncing task '{task_name}': {e}")
-                if 'response' in locals() and response is not None:
+                ok = False
+                if response is not None:
                     print(f"   Trello's response: {response.text}")
-        
-        # ** NEW ** Deletion loop
-        github_task_names = github_task_names_by_milestone.get(milestone_name, set())
-        for item_name, item_data in existing_items.items():
-            if item_name not in github_task_names:
-                print(f" -> Deleting task not found in GitHub: '{item_name}'")
-                try:
-                    url = f"{TRELLO_API_BASE_URL}/checklists/{checklist['id']}/checkItems/{item_data['id']}"
-                    params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN}
-                    response = requests.delete(url, params=params)
-                    response.raise_for_status()
-                except requests.exceptions.RequestException as e:
-                    print(f"!! ERROR deleting task '{item_name}': {e}")
-
 
-def sync_daily_log(card_id, card_data, daily_logs_from_github):
-    """Syncs all daily logs from GitHub to Trello, creating or updating comments as needed."""
+        # State updates and deletions don't depend on each other, so they run concurrently
+        writes = []
+        for item, state_str in plan.updates:
+            print(f" -> Updating task state for: '{item['name']}' to {state_str}")
+            url = f"{TRELLO_API_BASE_URL}/cards/{card_id}/checkItem/{item['id']}"
+            params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'state': state_str}
+            writes.append((f"syncing task '{item['name']}'", 'PUT', url, params))
+        for item in plan.deletes:
+            print(f" -> Deleting task not found in GitHub: '{item['name']}'")
+            url = f"{TRELLO_API_BASE_URL}/checklists/{checklist['id']}/checkItems/{item['id']}"
+            params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN}
+            writes.append((f"deleting task '{item['name']}'", 'DELETE', url, params))
+
+        for description, error in dispatch_writes(writes):
+            print(f"!! ERROR {description}: {error}")
+            ok = False
+            if getattr(error, 'response', None) is not None:
+                print(f"   Trello's response: {error.response.text}")
+
+    return ok
+
+def sync_daily_log(card_id, card_data, daily_logs_from_github, state):
+    """Syncs all daily logs from GitHub to Trello, creating or updating comments as needed. Returns False if any request failed."""
     print("\n--- Syncing Daily Logs to Comments ---")
+    ok = True
+    # Digests of the log bodies last synced to Trello, keyed by date
+    log_hashes = state.setdefault(card_id, {"checklists": {}}).setdefault("log_hashes", {})
     
     existing_comments = card_data.get('actions', [])
     
     posted_logs = {}
     for comment in existing_comments:
         text = comment['data']['text'].strip()
-        date_match = re.search(r"###\s*(\d{4}-\d{2}-\d{2})", text)
-        if date_match:
-            date_str = date_match.group(1)
-            posted_logs[date_str] = {"id": comment['id'], "text": text}
+        # Log comments are posted by this script and always start with "### YYYY-MM-DD"
+        if text.startswith("### "):
+            date_str = text[4:14]
+            if (len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-'
+                    and date_str[:4].isdigit() and date_str[5:7].isdigit() and date_str[8:].isdigit()):
+                posted_logs[date_str] = {"id": comment['id'], "text": text}
 
     sorted_logs = sorted(daily_logs_from_github.items())
 
     for date_str, log_content_from_github in sorted_logs:
         log_content_from_github = log_content_from_github.strip()
+        log_hash = blake2b(log_content_from_github.encode(), digest_size=16).hexdigest()
+
+        if log_hashes.get(date_str) == log_hash and date_str in posted_logs:
+            print(f"Log for {date_str} is already up to date. Skipping.")
+            continue
 
         if date_str in posted_logs:
             existing_comment_id = posted_logs[date_str]["id"]
@@ -209,26 +545,105 @@ def sync_daily_log(card_id, card_data, daily_logs_from_github):
                 url = f"{TRELLO_API_BASE_URL}/actions/{existing_comment_id}"
                 params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'text': log_content_from_github}
                 try:
-                    requests.put(url, params=params).raise_for_status()
+                    get_session().put(url, params=params).raise_for_status()
+                    log_hashes[date_str] = log_hash
                     print("-> Successfully updated comment.")
                 except requests.exceptions.RequestException as e:
                     print(f"Error updating comment for {date_str}: {e}")
+                    ok = False
             else:
+                log_hashes[date_str] = log_hash
                 print(f"Log for {date_str} is already up to date. Skipping.")
         else:
             print(f"Posting new comment for {date_str}...")
             url = f"{TRELLO_API_BASE_URL}/cards/{card_id}/actions/comments"
             params = {'key': TRELLO_API_KEY, 'token': TRELLO_API_TOKEN, 'text': log_content_from_github}
             try:
-                requests.post(url, params=params).raise_for_status()
+                get_session().post(url, params=params).raise_for_status()
+                log_hashes[date_str] = log_hash
                 print("-> Successfully posted comment.")
             except requests.exceptions.RequestException as e:
                 print(f"Error posting comment for {date_str}: {e}")
+                ok = False
+
+    return ok
 
 # --- Main Execution ---
+def run_intern(intern, state_lock, state, tree_futures):
+    """Runs process_intern on a worker thread and returns everything it printed."""
+    _thread_local.log_buffer = io.StringIO()
+    try:
+        process_intern(intern, state_lock, state, tree_futures)
+    except Exception as e:
+        print(f"!! ERROR: Unexpected failure while syncing {intern.get('name')}: {e}")
+    finally:
+        output = _thread_local.log_buffer.getvalue()
+        _thread_local.log_buffer = None
+    return output
+
+def process_intern(intern, state_lock, state, tree_futures):
+    """Syncs one intern's log file to their Trello card."""
+    intern_name = intern.get("name")
+    branch_name = intern.get("branch")
+    card_id = intern.get("trello_card_id")
+    file_path = intern.get("log_file_path")
+
+    if not all([intern_name, branch_name, card_id, file_path]):
+        print(f"Skipping invalid entry in config.json: {intern}")
+        return
+
+    # Each intern only touches its own URLs and card entry; the lock guards the shared containers
+    with state_lock:
+        http_cache = state.setdefault("http_cache", {})
+        parsed_cache = state.setdefault("parsed_cache", {}).setdefault(card_id, {})
+        card_state = state.setdefault(card_id, {"checklists": {}})
+        # Card bodies are no longer cached; drop any copy left in the state by older versions
+        http_cache.pop(f"{TRELLO_API_BASE_URL}/cards/{card_id}", None)
+
+    print(f"\n====================\nProcessing sync for: {intern_name}\n====================")
+    tree_future = tree_futures.get(branch_name)
+    tree = tree_future.result() if tree_future else None
+    blob_sha = tree.get(file_path) if tree else None
+    if blob_sha:
+        # Blobs are immutable, so a SHA seen before is served from the parsed cache without a fetch
+        print(f"Found '{file_path}' on branch '{branch_name}' (blob {blob_sha[:7]}).")
+        parsed_data = get_parsed_data(blob_sha, parsed_cache, lambda: get_github_blob_content(blob_sha))
+    else:
+        content, _ = get_github_file_content(branch_name, file_path, http_cache)
+        if content is None:
+            print(f"Could not fetch content for {intern_name}. Skipping.")
+            return
+        file_etag = http_cache.get(github_file_url(branch_name, file_path), {}).get("etag")
+        parsed_data = get_parsed_data(file_etag, parsed_cache, lambda: content)
+
+    if parsed_data is None:
+        print(f"Could not fetch content for {intern_name}. Skipping.")
+        return
+
+    # Nothing can have diverged if the log parses exactly as it did at the last successful sync
+    parsed_hash = parsed_data_hash(parsed_data)
+    if card_state.get("parsed_hash") == parsed_hash:
+        print(f"No changes in the log since the last successful sync. Skipping {intern_name}.")
+        return
+
+    card_data = get_trello_card_data(card_id)
+
+    if card_data is None:
+        print(f"Could not fetch Trello card data for {intern_name}. Skipping.")
+        return
+
+    milestones_ok = sync_milestones(card_id, card_data, parsed_data["milestones"], state)
+    logs_ok = sync_daily_log(card_id, card_data, parsed_data["daily_logs"], state)
+    if milestones_ok and logs_ok:
+        card_state["parsed_hash"] = parsed_hash
+    else:
+        card_state.pop("parsed_hash", None)
+
 def main():
     print("\n--- Starting Full Sync Cycle ---")
-    load_dotenv()
+    # Only read .env when the environment (e.g. a service definition) doesn't already provide everything
+    if not all(os.getenv(name) for name in REQUIRED_ENV_VARS):
+        load_dotenv()
     
     global REPO_OWNER, REPO_NAME, TRELLO_API_KEY, TRELLO_API_TOKEN, GITHUB_TOKEN
     REPO_OWNER = os.getenv("GITHUB_REPO_OWNER")
@@ -242,38 +657,35 @@ def main():
         return
 
     try:
-        with open(CONFIG_FILE, 'r') as f: config = json.load(f)
+        with open(CONFIG_FILE, 'rb') as f: config = json_loads(f.read())
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Error: Could not load or parse {CONFIG_FILE}: {e}")
         return
         
     state = load_state()
-
-    for intern in config.get("interns", []):
-        intern_name = intern.get("name")
-        branch_name = intern.get("branch")
-        card_id = intern.get("trello_card_id")
-        file_path = intern.get("log_file_path")
-
-        if not all([intern_name, branch_name, card_id, file_path]):
-            print(f"Skipping invalid entry in config.json: {intern}")
-            continue
-
-        print(f"\n====================\nProcessing sync for: {intern_name}\n====================")
-        content = get_github_file_content(branch_name, file_path)
-        if content is None:
-            print(f"Could not fetch content for {intern_name}. Skipping.")
-            continue
-            
-        parsed_data = parse_markdown(content)
-        card_data = get_trello_card_data(card_id)
-
-        if card_data is None:
-            print(f"Could not fetch Trello card data for {intern_name}. Skipping.")
-            continue
-            
-        sync_milestones(card_id, card_data, parsed_data["milestones"], state)
-        sync_daily_log(card_id, card_data, parsed_data["daily_logs"])
+    state_lock = threading.Lock()
+    http_cache = state.setdefault("http_cache", {})
+    interns = config.get("interns", [])
+
+    # Branches holding several log files are listed once to see which files changed; a branch with a
+    # single log file keeps its ETag-revalidated contents fetch, which stays a 304 until the log changes
+    paths_by_branch = {}
+    for intern in interns:
+        if intern.get("branch") and intern.get("log_file_path"):
+            paths_by_branch.setdefault(intern["branch"], set()).add(intern["log_file_path"])
+
+    # Worker output is buffered and printed in config order once each intern finishes
+    sys.stdout = ThreadBufferedStdout(sys.stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # Submitted first so the tree listings start before any intern waits on them
+            tree_futures = {branch: executor.submit(get_github_tree, branch, paths, http_cache)
+                            for branch, paths in paths_by_branch.items() if len(paths) > 1}
+            futures = [executor.submit(run_intern, intern, state_lock, state, tree_futures) for intern in interns]
+            for future in futures:
+                print(future.result(), end="")
+    finally:
+        sys.stdout = sys.stdout.stream
 
     save_state(state)
     print("\n--- Full Sync Cycle Complete ---")